@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Backend parity for tools/web_viewer/validate_log.py (run by ctest).
+
+Every available error kernel (Cython, numba, NumPy with and without numexpr),
+CSV engine and the stdlib streaming path must report the same
+(max_err, worst_frame, worst_key, first_nan_frame) for the same log.
+"""
+
+import csv
+import json
+import math
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+WEB_VIEWER_DIR = Path(__file__).resolve().parents[1] / "tools" / "web_viewer"
+sys.path.insert(0, str(WEB_VIEWER_DIR))
+
+import validate_log  # noqa: E402
+
+CFG = json.loads((WEB_VIEWER_DIR / "model_config_default.json").read_text(encoding="utf-8"))
+HEADER = [*validate_log.POSE_COLUMNS, *(f"{k}_{a}" for k in validate_log.CORNER_KEYS for a in "xz")]
+
+N_ROWS = 600  # > REDUCE_CHUNKS, so the chunked kernels split rows across chunks
+WORST_ROW = 137  # level pose: rb and fb share z, so their injected errors tie exactly
+WORST_DZ = 0.05
+DUP_ROW = 420  # copy of WORST_ROW: same error, later frame
+NAN_ROW = 250  # one NaN corner coordinate
+NAN_POSE_ROW = 300  # NaN pose, every corner NaN
+
+
+def pose_rows():
+    """Poses crossing ground, ramp and container, with corners from the model."""
+    rows = []
+    for i in range(N_ROWS):
+        s = -4.0 + 7.0 * i / N_ROWS
+        pitch = 0.0 if i == WORST_ROW else 0.07 * math.sin(i / 40.0)
+        tilt = 0.0 if i == WORST_ROW else 0.02 * math.cos(i / 25.0)
+        lift = 0.3 + 0.2 * math.sin(i / 60.0)
+        corners = validate_log.predicted_corners_cpp(CFG, s, pitch, tilt, lift)
+        row = [s, pitch, tilt, lift]
+        for key in validate_log.CORNER_KEYS:
+            row.extend(corners[key])
+        rows.append([f"{v:.6f}" for v in row])
+    return rows
+
+
+def write_log(path: Path, rows, blank_lines=False):
+    with path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for i, row in enumerate(rows):
+            if blank_lines and i % 97 == 0:
+                writer.writerow([])
+            writer.writerow(row)
+
+
+def backends():
+    """(name, patches) for every compute_errors()/CSV engine combination available here."""
+    kernels = [("numpy", validate_log.compute_errors_numpy, None)]
+    if validate_log.ne is not None:
+        kernels.append(("numpy+numexpr", validate_log.compute_errors_numpy, validate_log.ne))
+    if validate_log.compute_errors_numba is not None:
+        kernels.append(("numba", validate_log.compute_errors_numba, validate_log.ne))
+    if validate_log.compute_errors_aot is not None:
+        kernels.append(("cython", validate_log.compute_errors_aot, validate_log.ne))
+
+    engines = sorted({"c", validate_log.CSV_ENGINE})
+    for kernel_name, kernel, ne in kernels:
+        for engine in engines:
+            yield f"{kernel_name}/{engine}", {"compute_errors": kernel, "ne": ne, "CSV_ENGINE": engine}
+
+
+@unittest.skipIf(validate_log.pd is None, "numpy/pandas not installed")
+class BackendParity(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def check(self, name, rows=None, blank_lines=False, raw=None):
+        path = self.dir / f"{name}.csv"
+        if raw is not None:
+            path.write_bytes(raw)
+        else:
+            write_log(path, rows, blank_lines)
+
+        expected = validate_log.stream_errors(path, CFG)
+        for backend, patches in backends():
+            with self.subTest(log=name, backend=backend), mock.patch.multiple(validate_log, **patches):
+                got = validate_log.batch_errors(path, CFG)
+                self.assertEqual(got[1:], expected[1:])
+                # libm and SIMD cos/sin may differ in the last ulp.
+                self.assertAlmostEqual(got[0], expected[0], delta=1e-12)
+        return expected
+
+    def test_known_worst_frame_and_ties(self):
+        rows = pose_rows()
+        worst = rows[WORST_ROW]
+        for key in ("rb", "fb"):
+            i = HEADER.index(f"{key}_z")
+            worst[i] = f"{float(worst[i]) + WORST_DZ:.6f}"
+        rows[DUP_ROW] = list(worst)
+
+        err, frame, key, nan_frame = self.check("worst", rows)
+        self.assertAlmostEqual(err, WORST_DZ, delta=1e-5)
+        self.assertEqual((frame, key, nan_frame), (WORST_ROW, "rb", None))
+
+        err, frame, key, nan_frame = self.check("worst_blank_lines", rows, blank_lines=True)
+        self.assertEqual((frame, key, nan_frame), (WORST_ROW, "rb", None))
+
+    def test_nan_rows(self):
+        rows = pose_rows()
+        rows[NAN_ROW][HEADER.index("rt_x")] = "nan"
+        rows[NAN_POSE_ROW][HEADER.index("s")] = "nan"
+
+        err, frame, key, nan_frame = self.check("nan", rows)
+        self.assertLess(err, 1e-5)
+        self.assertEqual(nan_frame, NAN_ROW)
+
+        for row in rows:
+            row[HEADER.index("pitch")] = "nan"
+        self.assertEqual(self.check("all_nan", rows), (0.0, None, None, 0))
+
+    def test_empty_logs(self):
+        self.assertEqual(self.check("header_only", raw=(",".join(HEADER) + "\n").encode()), (0.0, None, None, None))
+        self.assertEqual(self.check("zero_byte", raw=b""), (0.0, None, None, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
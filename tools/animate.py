@@ -1,68 +1,110 @@
 #!/usr/bin/env python3
 
 import argparse
-import csv
+import contextlib
+import json
 import math
-from dataclasses import dataclass
-from typing import List
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+
+WEB_VIEWER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "web_viewer")
+sys.path.insert(0, WEB_VIEWER_DIR)
 
 try:
+    import matplotlib
+
+    # Frames are rendered off-screen and read straight from the Agg buffer.
+    matplotlib.use("Agg")
+
     import matplotlib.pyplot as plt
+    import numpy as np
+    import pandas as pd
     from matplotlib import animation
+    from PIL import Image
+
+    from kinematics import CORNER_KEYS, compute_corners
 except ModuleNotFoundError as e:
     missing = str(e)
     raise SystemExit(
-        "Missing Python dependency (e.g., matplotlib/Pillow).\n"
+        "Missing Python dependency (e.g., matplotlib/Pillow/pandas).\n"
         "Install with:\n"
         "  python3 -m pip install -r tools/requirements.txt\n\n"
         f"Original error: {missing}"
     )
 
 
-@dataclass
-class Sample:
-    t: float
-    s: float
-    pitch: float
-    lift: float
-    tilt: float
-    ceiling_z: float
-    floor_z: float
-    corners: List[tuple]
-    clear_top: float
-    clear_bottom: float
-    safety_level: int
-    terrain_state: int
-
-
-def load_csv(path: str) -> List[Sample]:
-    out: List[Sample] = []
-    with open(path, "r", newline="") as f:
-        reader = csv.DictReader(f)
-        for r in reader:
-            corners = [
-                (float(r["rb_x"]), float(r["rb_z"])),
-                (float(r["rt_x"]), float(r["rt_z"])),
-                (float(r["fb_x"]), float(r["fb_z"])),
-                (float(r["ft_x"]), float(r["ft_z"])),
-            ]
-            out.append(
-                Sample(
-                    t=float(r["time"]),
-                    s=float(r["s"]),
-                    pitch=float(r["pitch"]),
-                    lift=float(r["lift"]),
-                    tilt=float(r["tilt"]),
-                    ceiling_z=float(r["ceiling_z"]),
-                    floor_z=float(r["floor_z"]),
-                    corners=corners,
-                    clear_top=float(r["clearance_top"]),
-                    clear_bottom=float(r["clearance_bottom"]),
-                    safety_level=int(r["safety_level"]),
-                    terrain_state=int(r["terrain_state"]),
-                )
-            )
-    return out
+LOG_DTYPES = {
+    "time": np.float32,
+    "s": np.float32,
+    "pitch": np.float32,
+    "lift": np.float32,
+    "tilt": np.float32,
+    "ceiling_z": np.float32,
+    "floor_z": np.float32,
+    "rb_x": np.float32,
+    "rb_z": np.float32,
+    "rt_x": np.float32,
+    "rt_z": np.float32,
+    "fb_x": np.float32,
+    "fb_z": np.float32,
+    "ft_x": np.float32,
+    "ft_z": np.float32,
+    "clearance_top": np.float32,
+    "clearance_bottom": np.float32,
+    "safety_level": np.int8,
+    "terrain_state": np.int8,
+}
+
+CORNER_COLUMNS = tuple(f"{k}_{a}" for k in CORNER_KEYS for a in "xz")
+
+# closed rack outline rb -> fb -> ft -> rt -> rb (columns in CORNER_KEYS order)
+POLY_IDX = np.array([0, 2, 3, 1, 0])
+
+# safety_level 0=OK, 1=WARN, 2=STOP, 3=DEGRADED
+SAFETY_PALETTE = np.array(["#4fc37a", "#f0c850", "#f05050", "#a0a0dc"])
+
+
+def load_csv(path: str, with_corners: bool = True) -> SimpleNamespace:
+    """Load the replay columns as contiguous NumPy arrays (one per field).
+
+    corners_x/corners_z are (N, 4) in CORNER_KEYS order, or None when
+    with_corners is False (the eight corner columns are then not parsed).
+    """
+    # A zero-byte file has no header for pandas to parse; report it the same
+    # way as a header-only log.
+    if os.path.getsize(path) == 0:
+        raise SystemExit("empty log")
+
+    cols = [c for c in LOG_DTYPES if with_corners or c not in CORNER_COLUMNS]
+    df = pd.read_csv(path, engine="c", usecols=cols, dtype={c: LOG_DTYPES[c] for c in cols})
+
+    def col(name: str) -> np.ndarray:
+        return np.ascontiguousarray(df[name].to_numpy())
+
+    corners_x = corners_z = None
+    if with_corners:
+        corners_x = np.ascontiguousarray(df[[f"{k}_x" for k in CORNER_KEYS]].to_numpy())
+        corners_z = np.ascontiguousarray(df[[f"{k}_z" for k in CORNER_KEYS]].to_numpy())
+
+    return SimpleNamespace(
+        t=col("time"),
+        s=col("s"),
+        pitch=col("pitch"),
+        lift=col("lift"),
+        tilt=col("tilt"),
+        ceiling_z=col("ceiling_z"),
+        floor_z=col("floor_z"),
+        corners_x=corners_x,
+        corners_z=corners_z,
+        clear_top=col("clearance_top"),
+        clear_bottom=col("clearance_bottom"),
+        safety_level=col("safety_level"),
+        terrain_state=col("terrain_state"),
+    )
 
 
 def ramp_floor_z(x: float, ramp_deg: float = 4.0) -> float:
@@ -70,26 +112,138 @@ def ramp_floor_z(x: float, ramp_deg: float = 4.0) -> float:
     return a * x if x < 0.0 else 0.0
 
 
-def safety_color(level: int):
-    if level == 0:
-        return "#4fc37a"
-    if level == 1:
-        return "#f0c850"
-    if level == 2:
-        return "#f05050"
-    return "#a0a0dc"
+# --encoding-speed -> x264 preset
+ENCODING_PRESETS = {
+    "fast": "ultrafast",
+    "balanced": "veryfast",
+    "quality": "medium",
+}
+
+
+# frame file names written by parallel workers (ffmpeg image2 pattern)
+FRAME_PATTERN = "frame_%06d.png"
+
+
+def x264_args(encoding_speed: str) -> list:
+    return ["-preset", ENCODING_PRESETS[encoding_speed], "-pix_fmt", "yuv420p", "-crf", "23"]
+
+
+def encode_rgba(frames, size: tuple, out_mp4: str, fps: int, encoding_speed: str) -> None:
+    # Raw RGBA canvas buffers piped straight into x264; no per-frame savefig.
+    w, h = size
+    cmd = [
+        plt.rcParams["animation.ffmpeg_path"],
+        "-y",
+        "-loglevel",
+        "error",
+        "-f",
+        "rawvideo",
+        "-pix_fmt",
+        "rgba",
+        "-s",
+        f"{w}x{h}",
+        "-r",
+        str(fps),
+        "-i",
+        "-",
+        "-c:v",
+        "libx264",
+        *x264_args(encoding_speed),
+        out_mp4,
+    ]
+    with subprocess.Popen(cmd, stdin=subprocess.PIPE) as proc:
+        try:
+            for buf in frames:
+                proc.stdin.write(buf)
+            proc.stdin.close()
+        except BrokenPipeError:
+            # ffmpeg exited early (bad args, disk full, ...); stop feeding it and
+            # let its exit status below report the failure.
+            with contextlib.suppress(BrokenPipeError):
+                proc.stdin.close()
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+
+def encode_frames(frame_dir: str, out_mp4: str, fps: int, encoding_speed: str) -> None:
+    subprocess.run(
+        [
+            plt.rcParams["animation.ffmpeg_path"],
+            "-y",
+            "-loglevel",
+            "error",
+            "-framerate",
+            str(fps),
+            "-i",
+            os.path.join(frame_dir, FRAME_PATTERN),
+            "-c:v",
+            "libx264",
+            *x264_args(encoding_speed),
+            out_mp4,
+        ],
+        check=True,
+    )
 
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--log", required=True)
-    ap.add_argument("--out", required=True, help="Output .gif or .mp4")
-    ap.add_argument("--fps", type=int, default=30)
-    args = ap.parse_args()
+def mp4_to_gif(src: str, dst: str, fps: int) -> None:
+    # Single-pass palette generation keeps colors close to the source without
+    # PillowWriter's per-frame PNG round trip.
+    subprocess.run(
+        [
+            plt.rcParams["animation.ffmpeg_path"],
+            "-y",
+            "-loglevel",
+            "error",
+            "-i",
+            src,
+            "-vf",
+            f"fps={fps},split[a][b];[a]palettegen[p];[b][p]paletteuse",
+            dst,
+        ],
+        check=True,
+    )
 
-    samples = load_csv(args.log)
-    if not samples:
-        raise SystemExit("empty log")
+
+def write_gif_pillow(frames, size: tuple, out: str, fps: int) -> None:
+    # Slow path without ffmpeg: Pillow quantizes and encodes every frame itself.
+    images = [Image.frombuffer("RGBA", size, bytes(buf), "raw", "RGBA", 0, 1) for buf in frames]
+    images[0].save(out, save_all=True, append_images=images[1:], duration=int(1000 / fps), loop=0)
+
+
+def write_animation(frames, size: tuple, out: str, fps: int, encoding_speed: str) -> None:
+    has_ffmpeg = animation.FFMpegWriter.isAvailable()
+
+    if not out.lower().endswith(".gif"):
+        if not has_ffmpeg:
+            raise SystemExit("mp4 output requires ffmpeg on PATH (or write a .gif instead)")
+        encode_rgba(frames, size, out, fps, encoding_speed)
+        return
+
+    if not has_ffmpeg:
+        write_gif_pillow(frames, size, out, fps)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_mp4 = os.path.join(tmp, "replay.mp4")
+        encode_rgba(frames, size, tmp_mp4, fps, encoding_speed)
+        mp4_to_gif(tmp_mp4, out, fps)
+
+
+def build_replay(log: SimpleNamespace):
+    """Create the replay figure; update(i) moves every animated artist to frame i."""
+    times = log.t
+    s_arr = log.s
+    lift = log.lift
+    ceiling_z = log.ceiling_z
+    clear_top = log.clear_top
+    clear_bottom = log.clear_bottom
+    corner_x = log.corners_x
+    corner_z = log.corners_z
+    # unknown levels render as DEGRADED
+    level = log.safety_level
+    colors = SAFETY_PALETTE[np.where((level >= 0) & (level <= 2), level, 3)]
+    # lowest clearance over the whole log, one vectorized pass
+    clear_min = float(np.minimum(clear_top, clear_bottom).min())
 
     x_min, x_max = -2.0, 2.2
     z_min, z_max = -0.8, 3.0
@@ -106,59 +260,193 @@ def main():
     ax.set_ylabel("z (m)")
     ax.set_title("Truck load fork control: 2D replay")
 
-    ax2.set_xlim(samples[0].t, samples[-1].t)
-    ax2.set_ylim(min(min(s.clear_top, s.clear_bottom) for s in samples) - 0.1, 0.6)
+    ax2.set_xlim(float(times[0]), float(times[-1]))
+    ax2.set_ylim(clear_min - 0.1, 0.6)
     ax2.set_xlabel("time (s)")
     ax2.set_ylabel("clearance (m)")
 
     floor_line, = ax.plot([], [], lw=2, color="#8888aa")
-    ceiling_line, = ax.plot([], [], lw=1, color="#777788")
-    door_line, = ax.plot([0, 0], [0, samples[0].ceiling_z], lw=2, color="#ccccdd")
+    ceiling_line, = ax.plot([], [], lw=1, color="#777788", animated=True)
+    door_line, = ax.plot([0, 0], [0, ceiling_z[0]], lw=2, color="#ccccdd", animated=True)
 
-    rack_poly, = ax.plot([], [], lw=3)
-    pivot_pt, = ax.plot([], [], marker="o", color="#dddddd")
+    rack_poly, = ax.plot([], [], lw=3, animated=True)
+    pivot_pt, = ax.plot([], [], marker="o", color="#dddddd", animated=True)
+
+    # Per-frame status lives inside the axes as an animated artist; updating the
+    # title instead would touch non-animated text and defeat blitting.
+    status_text = ax.text(
+        0.01, 0.98, "", transform=ax.transAxes, va="top", fontsize=9, animated=True
+    )
 
     top_curve, = ax2.plot([], [], lw=1.5, color="#4fc37a", label="clear_top")
     bottom_curve, = ax2.plot([], [], lw=1.5, color="#f0c850", label="clear_bottom")
-    marker_t = ax2.axvline(samples[0].t, color="#aaaaaa", lw=1)
+    marker_t = ax2.axvline(times[0], color="#aaaaaa", lw=1, animated=True)
     ax2.legend(loc="upper right")
 
-    times = [s.t for s in samples]
-    tops = [s.clear_top for s in samples]
-    bottoms = [s.clear_bottom for s in samples]
-
-    top_curve.set_data(times, tops)
-    bottom_curve.set_data(times, bottoms)
+    top_curve.set_data(times, clear_top)
+    bottom_curve.set_data(times, clear_bottom)
 
     xs = [x_min + (x_max - x_min) * i / 80 for i in range(81)]
     floor = [ramp_floor_z(x) for x in xs]
     floor_line.set_data(xs, floor)
 
+    # Per-frame buffers, filled in place by update() instead of building fresh
+    # lists for every set_data call.
+    poly_x = np.empty(len(POLY_IDX), dtype=corner_x.dtype)
+    poly_z = np.empty(len(POLY_IDX), dtype=corner_z.dtype)
+    ceil_x = np.array([x_min, x_max])
+    ceil_z = np.empty(2)
+    door_x = np.zeros(2)
+    door_z = np.zeros(2)
+    pivot_x = np.empty(1)
+    pivot_z = np.empty(1)
+    marker_x = np.empty(2)
+
+    # Last values pushed to the artists; set_data/set_color invalidate cached
+    # paths/transforms, so frames that repeat a value skip the call. The
+    # ceiling and safety level usually hold for long stretches of a log.
+    prev_cz = None
+    prev_color = None
+    prev_pivot = None
+
     def update(i: int):
-        s = samples[i]
-        ceiling_line.set_data([x_min, x_max], [s.ceiling_z, s.ceiling_z])
-        door_line.set_data([0, 0], [0, s.ceiling_z])
+        nonlocal prev_cz, prev_color, prev_pivot
+
+        cz = ceiling_z[i]
+        if cz != prev_cz:
+            ceil_z[:] = cz
+            door_z[1] = cz
+            ceiling_line.set_data(ceil_x, ceil_z)
+            door_line.set_data(door_x, door_z)
+            prev_cz = cz
+
+        np.take(corner_x[i], POLY_IDX, out=poly_x)
+        np.take(corner_z[i], POLY_IDX, out=poly_z)
+        rack_poly.set_data(poly_x, poly_z)
+        color = colors[i]
+        if color != prev_color:
+            rack_poly.set_color(color)
+            prev_color = color
+
+        pivot = (s_arr[i], lift[i])
+        if pivot != prev_pivot:
+            pivot_x[0], pivot_z[0] = pivot
+            pivot_pt.set_data(pivot_x, pivot_z)
+            prev_pivot = pivot
+
+        t = times[i]
+        marker_x[:] = t
+        marker_t.set_xdata(marker_x)
+        status_text.set_text(
+            f"t={t:.2f}s  s={s_arr[i]:.2f}m  clear_top={clear_top[i]:.3f}m  "
+            f"clear_bottom={clear_bottom[i]:.3f}m"
+        )
+        return rack_poly, pivot_pt, ceiling_line, door_line, marker_t, status_text
+
+    return fig, update
+
+
+def blit_frames(fig, update, frames):
+    """Yield the figure's RGBA buffer for each frame index.
+
+    The static background is rendered once; each frame restores it and draws
+    only the artists returned by update(i). The yielded buffer is reused, so
+    consume it before advancing.
+    """
+    canvas = fig.canvas
+    canvas.draw()
+    background = canvas.copy_from_bbox(fig.bbox)
+    for i in frames:
+        canvas.restore_region(background)
+        for artist in update(i):
+            fig.draw_artist(artist)
+        yield canvas.buffer_rgba()
+
+
+def render_frame_range(log: SimpleNamespace, start: int, stop: int, frame_dir: str) -> None:
+    # Worker process: own figure, frames [start, stop) as PNGs.
+    fig, update = build_replay(log)
+    size = fig.canvas.get_width_height(physical=True)
+    for i, buf in zip(range(start, stop), blit_frames(fig, update, range(start, stop))):
+        Image.frombuffer("RGBA", size, buf, "raw", "RGBA", 0, 1).save(
+            os.path.join(frame_dir, FRAME_PATTERN % i), compress_level=1
+        )
+    plt.close(fig)
 
-        rb, rt, fb, ft = s.corners
-        poly = [rb, fb, ft, rt, rb]
-        rack_poly.set_data([p[0] for p in poly], [p[1] for p in poly])
-        rack_poly.set_color(safety_color(s.safety_level))
 
-        pivot_pt.set_data([s.s], [s.lift])
+def render_parallel(log: SimpleNamespace, out: str, fps: int, encoding_speed: str, jobs: int) -> None:
+    if not animation.FFMpegWriter.isAvailable():
+        raise SystemExit("parallel rendering requires ffmpeg on PATH (use --jobs 1)")
 
-        marker_t.set_xdata([s.t, s.t])
-        ax.set_title(
-            f"t={s.t:.2f}s  s={s.s:.2f}m  clear_top={s.clear_top:.3f}m  clear_bottom={s.clear_bottom:.3f}m"
-        )
-        return rack_poly, pivot_pt, ceiling_line, door_line, marker_t
+    n = len(log.t)
+    jobs = max(1, min(jobs, n))
+    bounds = np.linspace(0, n, jobs + 1).astype(int)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [
+                pool.submit(render_frame_range, log, int(start), int(stop), tmp)
+                for start, stop in zip(bounds[:-1], bounds[1:])
+                if stop > start
+            ]
+            for fut in futures:
+                fut.result()
+
+        if out.lower().endswith(".gif"):
+            tmp_mp4 = os.path.join(tmp, "replay.mp4")
+            encode_frames(tmp, tmp_mp4, fps, encoding_speed)
+            mp4_to_gif(tmp_mp4, out, fps)
+        else:
+            encode_frames(tmp, out, fps, encoding_speed)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--log", required=True)
+    ap.add_argument("--out", default="tlf_replay.mp4", help="Output .mp4 (default) or .gif")
+    ap.add_argument("--fps", type=int, default=30)
+    ap.add_argument(
+        "--encoding-speed",
+        choices=sorted(ENCODING_PRESETS),
+        default="balanced",
+        help="x264 speed/quality trade-off (ffmpeg output only)",
+    )
+    ap.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="worker processes rendering frames in parallel (0 = all cores; >1 requires ffmpeg)",
+    )
+    ap.add_argument(
+        "--corners",
+        choices=["log", "model"],
+        default="log",
+        help="draw the logged cargo corners, or recompute them from the pose columns with --config",
+    )
+    ap.add_argument(
+        "--config",
+        default=os.path.join(WEB_VIEWER_DIR, "model_config_default.json"),
+        help="viewer model config used by --corners model",
+    )
+    args = ap.parse_args()
+
+    log = load_csv(args.log, with_corners=args.corners == "log")
+    n = len(log.t)
+    if n == 0:
+        raise SystemExit("empty log")
 
-    ani = animation.FuncAnimation(fig, update, frames=len(samples), interval=1000 / args.fps, blit=False)
+    if args.corners == "model":
+        with open(args.config, "r", encoding="utf-8") as f:
+            cfg = json.load(f)
+        log.corners_x, log.corners_z = compute_corners(cfg, log.s, log.pitch, log.tilt, log.lift)
 
-    if args.out.lower().endswith(".gif"):
-        ani.save(args.out, writer=animation.PillowWriter(fps=args.fps))
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    if jobs > 1:
+        render_parallel(log, args.out, args.fps, args.encoding_speed, jobs)
     else:
-        # mp4 requires ffmpeg installed
-        ani.save(args.out, writer="ffmpeg", fps=args.fps)
+        fig, update = build_replay(log)
+        size = fig.canvas.get_width_height(physical=True)
+        write_animation(blit_frames(fig, update, range(n)), size, args.out, args.fps, args.encoding_speed)
 
     print(f"Wrote animation: {args.out}")
 
@@ -0,0 +1,153 @@
+# Ahead-of-time compiled corner check for validate_log.py (no JIT warm-up).
+# Build in place with:
+#   cd tools/web_viewer && python3 setup.py build_ext --inplace
+
+from cython cimport floating
+from cython.parallel cimport prange
+from libc.math cimport cos, fabs, isnan, sin, tan, M_PI
+from libc.stdlib cimport free, malloc
+
+
+cdef inline double floor_at(double x, double door, double floor_z, double container_len,
+                            double ground_z, double ramp_start_x) noexcept nogil:
+    # env_floor_z_at_x() in validate_log.py
+    if door <= x <= door + container_len:
+        return floor_z
+    if x <= ramp_start_x:
+        return ground_z
+    return ground_z + (x - ramp_start_x) / (door - ramp_start_x) * (floor_z - ground_z)
+
+
+cdef void scan_rows(
+    const floating[::1] s,
+    const floating[::1] pitch,
+    const floating[::1] tilt,
+    const floating[::1] lift,
+    const floating[:, ::1] logged_x,
+    const floating[:, ::1] logged_z,
+    Py_ssize_t start,
+    Py_ssize_t stop,
+    double door,
+    double floor_z,
+    double container_len,
+    double ground_z,
+    double ramp_start_x,
+    double mast_pivot_h,
+    const double* off_x,
+    const double* off_z,
+    double* out_err,
+    Py_ssize_t* out_row,
+    Py_ssize_t* out_corner,
+    Py_ssize_t* out_nan_row,
+) noexcept nogil:
+    # Running max over rows [start, stop); strict > keeps the first maximum.
+    cdef Py_ssize_t i, k
+    cdef Py_ssize_t best_i = start, best_k = 0, nan_i = -1
+    cdef double best = -1.0
+    cdef double x, theta, c, sn, pivot_x, pivot_z, px, pz, err, ex, ez
+
+    for i in range(start, stop):
+        x = s[i]
+        theta = pitch[i] + tilt[i]
+        c = cos(theta)
+        sn = sin(theta)
+
+        pivot_x = x - sn * lift[i]
+        pivot_z = floor_at(x, door, floor_z, container_len, ground_z, ramp_start_x) + mast_pivot_h + c * lift[i]
+
+        for k in range(4):
+            px = pivot_x + c * off_x[k] - sn * off_z[k]
+            pz = pivot_z + sn * off_x[k] + c * off_z[k]
+            ex = fabs(px - logged_x[i, k])
+            ez = fabs(pz - logged_z[i, k])
+            if nan_i < 0 and (isnan(ex) or isnan(ez)):
+                nan_i = i
+            err = ez if isnan(ex) or ez > ex else ex
+            if err > best:
+                best = err
+                best_i = i
+                best_k = k
+
+    out_err[0] = best
+    out_row[0] = best_i
+    out_corner[0] = best_k
+    out_nan_row[0] = nan_i
+
+
+def compute_errors(
+    const floating[::1] s,
+    const floating[::1] pitch,
+    const floating[::1] tilt,
+    const floating[::1] lift,
+    const floating[:, ::1] logged_x,
+    const floating[:, ::1] logged_z,
+    double door,
+    double floor_z,
+    double container_len,
+    double ramp_l,
+    double slope_deg,
+    double mast_pivot_h,
+    double cargo_l,
+    double cargo_h,
+    double mount_x,
+    double mount_z,
+    Py_ssize_t reduce_chunks,
+):
+    """validate_log.compute_errors() plus its REDUCE_CHUNKS; N must be > 0.
+
+    Same chunked reduction as validate_log._compute_errors_loop(), with the
+    chunks spread over OpenMP threads.
+    """
+    cdef Py_ssize_t n = s.shape[0]
+    cdef Py_ssize_t n_chunks = reduce_chunks if n > reduce_chunks else n
+    cdef Py_ssize_t ci, worst = 0
+    cdef double ground_z = floor_z - tan(slope_deg * M_PI / 180.0) * ramp_l
+    cdef double ramp_start_x = door - ramp_l
+
+    # cargo corner offsets in the fork frame, CORNER_KEYS order
+    cdef double off_x[4]
+    cdef double off_z[4]
+    off_x[0] = mount_x
+    off_x[1] = mount_x
+    off_x[2] = mount_x + cargo_l
+    off_x[3] = mount_x + cargo_l
+    off_z[0] = mount_z
+    off_z[1] = mount_z + cargo_h
+    off_z[2] = mount_z
+    off_z[3] = mount_z + cargo_h
+
+    cdef double* chunk_err = <double*> malloc(n_chunks * sizeof(double))
+    cdef Py_ssize_t* chunk_row = <Py_ssize_t*> malloc(n_chunks * sizeof(Py_ssize_t))
+    cdef Py_ssize_t* chunk_corner = <Py_ssize_t*> malloc(n_chunks * sizeof(Py_ssize_t))
+    cdef Py_ssize_t* chunk_nan_row = <Py_ssize_t*> malloc(n_chunks * sizeof(Py_ssize_t))
+    cdef Py_ssize_t first_nan = -1
+    if chunk_err == NULL or chunk_row == NULL or chunk_corner == NULL or chunk_nan_row == NULL:
+        free(chunk_err)
+        free(chunk_row)
+        free(chunk_corner)
+        free(chunk_nan_row)
+        raise MemoryError()
+
+    try:
+        for ci in prange(n_chunks, nogil=True, schedule="static"):
+            scan_rows(
+                s, pitch, tilt, lift, logged_x, logged_z,
+                ci * n // n_chunks, (ci + 1) * n // n_chunks,
+                door, floor_z, container_len, ground_z, ramp_start_x, mast_pivot_h,
+                off_x, off_z,
+                &chunk_err[ci], &chunk_row[ci], &chunk_corner[ci], &chunk_nan_row[ci],
+            )
+
+        for ci in range(1, n_chunks):
+            if chunk_err[ci] > chunk_err[worst]:
+                worst = ci
+        for ci in range(n_chunks):
+            if chunk_nan_row[ci] >= 0:
+                first_nan = chunk_nan_row[ci]
+                break
+        return chunk_err[worst], chunk_row[worst], chunk_corner[worst], first_nan
+    finally:
+        free(chunk_err)
+        free(chunk_row)
+        free(chunk_corner)
+        free(chunk_nan_row)
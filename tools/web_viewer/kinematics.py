@@ -0,0 +1,79 @@
+"""Vectorized cargo-corner kinematics shared by validate_log.py and tools/animate.py.
+
+Everything is in C++ log coordinates; corner arrays are (N, 4) in CORNER_KEYS order.
+"""
+
+import math
+
+import numpy as np
+
+CORNER_KEYS = ("rb", "rt", "fb", "ft")
+
+
+def model_params(cfg: dict) -> tuple:
+    """Scalar config values in the argument order of predict_corners()."""
+    env = cfg["environment"]
+    mo = cfg.get("cargo", {}).get("mount_offset", {})
+    return (
+        float(env["container"]["door_x"]),
+        float(env["container"]["floor_z"]),
+        float(env["container"]["length"]),
+        float(env["ramp"]["length"]),
+        float(env["ramp"]["slope_deg"]),
+        float(cfg["vehicle"]["mast"]["pivot_height"]),
+        float(cfg["cargo"]["length"]),
+        float(cfg["cargo"]["height"]),
+        float(mo.get("x", 0.0)),
+        float(mo.get("z", 0.0)),
+    )
+
+
+def predict_corners(
+    s,
+    pitch,
+    tilt,
+    lift,
+    door,
+    floor_z,
+    container_len,
+    ramp_l,
+    slope_deg,
+    mast_pivot_h,
+    cargo_l,
+    cargo_h,
+    mount_x,
+    mount_z,
+):
+    """Cargo corners for every pose row; returns (corner_x, corner_z).
+
+    Intermediates stay in the dtype of the pose arrays.
+    """
+    h = math.tan(math.radians(slope_deg)) * ramp_l
+    ground_z = floor_z - h
+    ramp_start_x = door - ramp_l
+
+    # env_floor_z_at_x() cases in the same priority order; anything else is
+    # the ramp interpolation.
+    floor_at_mast = np.select(
+        [(s >= door) & (s <= door + container_len), s <= ramp_start_x],
+        [floor_z, ground_z],
+        default=ground_z + (s - ramp_start_x) / (door - ramp_start_x) * (floor_z - ground_z),
+    )
+
+    theta = pitch + tilt
+    c = np.cos(theta)[:, None]
+    sn = np.sin(theta)[:, None]
+
+    pivot_x = (s - sn[:, 0] * lift)[:, None]
+    pivot_z = (floor_at_mast + mast_pivot_h + c[:, 0] * lift)[:, None]
+
+    # cargo corner offsets in the fork frame, CORNER_KEYS order
+    off_x = np.array([mount_x, mount_x, mount_x + cargo_l, mount_x + cargo_l], dtype=s.dtype)
+    off_z = np.array([mount_z, mount_z + cargo_h, mount_z, mount_z + cargo_h], dtype=s.dtype)
+
+    return pivot_x + c * off_x - sn * off_z, pivot_z + sn * off_x + c * off_z
+
+
+def compute_corners(cfg: dict, s, pitch, tilt, lift):
+    """predict_corners() with the model taken from a viewer config dict."""
+    return predict_corners(s, pitch, tilt, lift, *model_params(cfg))
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+# Optional AOT build of the validator kernel:
+#   cd tools/web_viewer && python3 setup.py build_ext --inplace
+
+import sys
+
+from Cython.Build import cythonize
+from setuptools import Extension, setup
+
+# The row scan is a cython.parallel.prange over chunks. Apple clang ships
+# without OpenMP, so on macOS the loop builds (and runs) serially unless an
+# OpenMP-capable compiler is configured.
+openmp_flags = [] if sys.platform == "darwin" else ["-fopenmp"]
+
+setup(
+    name="tlf-web-viewer-kinematics",
+    ext_modules=cythonize(
+        [
+            Extension(
+                "_kinematics",
+                ["_kinematics.pyx"],
+                extra_compile_args=openmp_flags,
+                extra_link_args=openmp_flags,
+            )
+        ],
+        compiler_directives={
+            "language_level": "3",
+            "boundscheck": False,
+            "wraparound": False,
+            "cdivision": True,
+        },
+    ),
+)
@@ -3,21 +3,55 @@
 import csv
 import json
 import math
+import mmap
 import sys
-from dataclasses import dataclass
 from pathlib import Path
 
+# Optional dependencies, fastest first:
+# - _kinematics extension (see setup.py): OpenMP-parallel Cython kernel, no JIT wait
+# - numba: the per-row kernel is JIT-compiled
+# - numpy/pandas: the whole log is checked in one vectorized pass
+#   (parsed by pyarrow's multithreaded CSV reader, and the error reduction
+#   fused by numexpr, when those are installed)
+# - neither: the log is streamed row by row with the csv module
+try:
+    import numpy as np
+    import pandas as pd
 
-@dataclass(frozen=True)
-class Vec2:
-    x: float
-    z: float
+    from kinematics import model_params, predict_corners
+except ModuleNotFoundError:
+    np = None
+    pd = None
 
+try:
+    import pyarrow  # noqa: F401
+
+    CSV_ENGINE = "pyarrow"
+except ModuleNotFoundError:
+    CSV_ENGINE = "c"
+
+try:
+    import _kinematics
+except ImportError:
+    _kinematics = None
+
+try:
+    import numexpr as ne
+except ModuleNotFoundError:
+    ne = None
+
+try:
+    from numba import njit, prange
+except ModuleNotFoundError:
+    njit = None
 
-def rot(theta: float, x: float, z: float) -> Vec2:
-    c = math.cos(theta)
-    s = math.sin(theta)
-    return Vec2(c * x - s * z, s * x + c * z)
+
+CORNER_KEYS = ("rb", "rt", "fb", "ft")
+POSE_COLUMNS = ("s", "pitch", "tilt", "lift")
+
+# row chunks reduced independently by the numba and Cython kernels (>= typical core count);
+# see _compute_errors_loop()
+REDUCE_CHUNKS = 256
 
 
 def env_floor_z_at_x(cfg: dict, x_cpp: float) -> float:
@@ -45,12 +79,7 @@ def env_floor_z_at_x(cfg: dict, x_cpp: float) -> float:
     return ground_z + t * (floor_z - ground_z)
 
 
-def predicted_corners_cpp(cfg: dict, row: dict) -> dict:
-    s = float(row["s"])
-    pitch = float(row["pitch"])
-    tilt = float(row["tilt"])
-    lift = float(row["lift"])
-
+def predicted_corners_cpp(cfg: dict, s: float, pitch: float, tilt: float, lift: float) -> dict:
     theta = pitch + tilt
 
     mast_pivot_h = float(cfg["vehicle"]["mast"]["pivot_height"])
@@ -61,29 +90,279 @@ def predicted_corners_cpp(cfg: dict, row: dict) -> dict:
     mount_z = float(mo.get("z", 0.0))
 
     floor_at_mast = env_floor_z_at_x(cfg, s)
-    mast_base = Vec2(s, floor_at_mast + mast_pivot_h)
 
-    lift_vec = rot(theta, 0.0, lift)
-    pivot = Vec2(mast_base.x + lift_vec.x, mast_base.z + lift_vec.z)
+    # Every rotation below uses the same theta: one cos/sin per row.
+    c = math.cos(theta)
+    sn = math.sin(theta)
 
-    rb_off = rot(theta, mount_x, mount_z)
-    rt_off = rot(theta, mount_x, mount_z + cargo_h)
-    fb_off = rot(theta, mount_x + cargo_l, mount_z)
-    ft_off = rot(theta, mount_x + cargo_l, mount_z + cargo_h)
+    # lift acts along the rotated mast axis (0, lift)
+    pivot_x = s - sn * lift
+    pivot_z = floor_at_mast + mast_pivot_h + c * lift
 
-    rb = Vec2(pivot.x + rb_off.x, pivot.z + rb_off.z)
-    rt = Vec2(pivot.x + rt_off.x, pivot.z + rt_off.z)
-    fb = Vec2(pivot.x + fb_off.x, pivot.z + fb_off.z)
-    ft = Vec2(pivot.x + ft_off.x, pivot.z + ft_off.z)
+    # corner offset (ox, oz) rotated: (c*ox - sn*oz, sn*ox + c*oz)
+    near_x = mount_x
+    far_x = mount_x + cargo_l
+    bottom_z = mount_z
+    top_z = mount_z + cargo_h
 
     return {
-        "rb": rb,
-        "rt": rt,
-        "fb": fb,
-        "ft": ft,
+        "rb": (pivot_x + c * near_x - sn * bottom_z, pivot_z + sn * near_x + c * bottom_z),
+        "rt": (pivot_x + c * near_x - sn * top_z, pivot_z + sn * near_x + c * top_z),
+        "fb": (pivot_x + c * far_x - sn * bottom_z, pivot_z + sn * far_x + c * bottom_z),
+        "ft": (pivot_x + c * far_x - sn * top_z, pivot_z + sn * far_x + c * top_z),
     }
 
 
+def _compute_errors_loop(
+    s,
+    pitch,
+    tilt,
+    lift,
+    logged_x,
+    logged_z,
+    door,
+    floor_z,
+    container_len,
+    ramp_l,
+    slope_deg,
+    mast_pivot_h,
+    cargo_l,
+    cargo_h,
+    mount_x,
+    mount_z,
+):
+    """Batch version of predicted_corners_cpp() compared against the logged corners.
+
+    logged_x/logged_z are (N, 4) in CORNER_KEYS order. Returns
+    (max_err, worst_row, worst_corner, first_nan_row); N must be > 0. A corner's
+    error is the larger of its x/z deviations with a NaN one ignored (np.fmax);
+    first_nan_row is the earliest row with any NaN deviation, or -1, so callers
+    can fail the log instead of silently skipping it. max_err is -1.0 if every
+    error is NaN. Written as a loop for numba; see compute_errors_numpy() for
+    the pure NumPy equivalent.
+    """
+    n = s.shape[0]
+
+    h = math.tan(math.radians(slope_deg)) * ramp_l
+    ground_z = floor_z - h
+    ramp_start_x = door - ramp_l
+
+    # cargo corner offsets in the fork frame, CORNER_KEYS order
+    off_x = np.empty(4)
+    off_z = np.empty(4)
+    off_x[0] = off_x[1] = mount_x
+    off_x[2] = off_x[3] = mount_x + cargo_l
+    off_z[0] = off_z[2] = mount_z
+    off_z[1] = off_z[3] = mount_z + cargo_h
+
+    # Contiguous row ranges, each with its own running max; the per-chunk
+    # results are reduced after the parallel loop. A fixed chunk count (rather
+    # than numba.get_num_threads()) keeps the kernel cacheable.
+    n_chunks = min(REDUCE_CHUNKS, n)
+    chunk_err = np.empty(n_chunks)
+    chunk_row = np.empty(n_chunks, dtype=np.int64)
+    chunk_corner = np.empty(n_chunks, dtype=np.int64)
+    chunk_nan_row = np.empty(n_chunks, dtype=np.int64)
+
+    for ci in prange(n_chunks):
+        best = -1.0
+        best_i = 0
+        best_k = 0
+        nan_i = -1
+        for i in range(ci * n // n_chunks, (ci + 1) * n // n_chunks):
+            x = s[i]
+            if door <= x <= door + container_len:
+                floor_at_mast = floor_z
+            elif x <= ramp_start_x:
+                floor_at_mast = ground_z
+            else:
+                floor_at_mast = ground_z + (x - ramp_start_x) / (door - ramp_start_x) * (floor_z - ground_z)
+
+            theta = pitch[i] + tilt[i]
+            c = math.cos(theta)
+            sn = math.sin(theta)
+
+            pivot_x = x - sn * lift[i]
+            pivot_z = floor_at_mast + mast_pivot_h + c * lift[i]
+
+            for k in range(4):
+                px = pivot_x + c * off_x[k] - sn * off_z[k]
+                pz = pivot_z + sn * off_x[k] + c * off_z[k]
+                ex = abs(px - logged_x[i, k])
+                ez = abs(pz - logged_z[i, k])
+                if nan_i < 0 and (math.isnan(ex) or math.isnan(ez)):
+                    nan_i = i
+                err = ez if math.isnan(ex) or ez > ex else ex
+                if err > best:
+                    best = err
+                    best_i = i
+                    best_k = k
+        chunk_err[ci] = best
+        chunk_row[ci] = best_i
+        chunk_corner[ci] = best_k
+        chunk_nan_row[ci] = nan_i
+
+    # Chunks are in row order, so the first maximal chunk holds the earliest
+    # worst row, and the first chunk that saw a NaN holds the earliest NaN row.
+    worst = np.argmax(chunk_err)
+    first_nan = -1
+    for ci in range(n_chunks):
+        if chunk_nan_row[ci] >= 0:
+            first_nan = chunk_nan_row[ci]
+            break
+    return chunk_err[worst], chunk_row[worst], chunk_corner[worst], first_nan
+
+
+def compute_errors_numpy(
+    s,
+    pitch,
+    tilt,
+    lift,
+    logged_x,
+    logged_z,
+    door,
+    floor_z,
+    container_len,
+    ramp_l,
+    slope_deg,
+    mast_pivot_h,
+    cargo_l,
+    cargo_h,
+    mount_x,
+    mount_z,
+):
+    """Vectorized compute_errors(): same arguments and result, no numba needed."""
+    pred_x, pred_z = predict_corners(
+        s,
+        pitch,
+        tilt,
+        lift,
+        door,
+        floor_z,
+        container_len,
+        ramp_l,
+        slope_deg,
+        mast_pivot_h,
+        cargo_l,
+        cargo_h,
+        mount_x,
+        mount_z,
+    )
+
+    if ne is not None:
+        # Fused, multithreaded passes instead of NumPy temporaries; each
+        # deviation is computed once and reused by the NaN check and the fmax.
+        ex = ne.evaluate("abs(pred_x - logged_x)")
+        ez = ne.evaluate("abs(pred_z - logged_z)")
+        err = ne.evaluate("where((ex != ex) | (ez > ex), ez, ex)")
+        nan_mask = ne.evaluate("(ex != ex) | (ez != ez)")
+    else:
+        ex = np.abs(pred_x - logged_x)
+        ez = np.abs(pred_z - logged_z)
+        err = np.fmax(ex, ez)
+        nan_mask = np.isnan(ex) | np.isnan(ez)
+    nan_rows = np.flatnonzero(nan_mask.any(axis=1))
+
+    first_nan = int(nan_rows[0]) if nan_rows.size else -1
+    if np.isnan(err).all():
+        return -1.0, 0, 0, first_nan
+    # Row-major argmax: earliest frame first, then earliest corner, like the loop.
+    worst_row, worst_corner = divmod(int(np.nanargmax(err)), err.shape[1])
+    return err[worst_row, worst_corner], worst_row, worst_corner, first_nan
+
+
+# No fastmath: contraction and reassociation would move the errors by an ulp
+# against the other backends, and the no-NaN flags would drop the isnan() checks.
+compute_errors_numba = None if njit is None else njit(parallel=True, cache=True)(_compute_errors_loop)
+
+if _kinematics is None:
+    compute_errors_aot = None
+else:
+
+    def compute_errors_aot(*args):
+        """The _kinematics extension's kernel, reducing over the same REDUCE_CHUNKS."""
+        return _kinematics.compute_errors(*args, REDUCE_CHUNKS)
+
+
+compute_errors = compute_errors_aot or compute_errors_numba or compute_errors_numpy
+
+
+def batch_errors(csv_path: Path, cfg: dict) -> tuple:
+    """(max_err, worst_frame, worst_key, first_nan_frame) for the whole log via compute_errors()."""
+    if csv_path.stat().st_size == 0:
+        return 0.0, None, None, None
+
+    # Hand the parser the mapped file so it scans the pages in bulk instead of
+    # going through Python's buffered text IO.
+    with csv_path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        df = pd.read_csv(
+            mm,
+            engine=CSV_ENGINE,
+            usecols=[*POSE_COLUMNS, *(f"{k}_{a}" for k in CORNER_KEYS for a in "xz")],
+            # Stay in float64: float32 rounding alone reaches ~6e-6 m at s ~ 36 m,
+            # too close to validation_tol, and would pick the worst frame from noise.
+            dtype=np.float64,
+        )
+    if not len(df):
+        return 0.0, None, None, None
+
+    err, frame, corner, nan_frame = compute_errors(
+        *(np.ascontiguousarray(df[name].to_numpy()) for name in POSE_COLUMNS),
+        np.ascontiguousarray(df[[f"{k}_x" for k in CORNER_KEYS]].to_numpy()),
+        np.ascontiguousarray(df[[f"{k}_z" for k in CORNER_KEYS]].to_numpy()),
+        *model_params(cfg),
+    )
+    nan_frame = int(nan_frame) if nan_frame >= 0 else None
+    # Same reporting rule as a strict running max starting at 0.
+    if not err > 0.0:
+        return 0.0, None, None, nan_frame
+    return float(err), int(frame), CORNER_KEYS[corner], nan_frame
+
+
+def stream_errors(csv_path: Path, cfg: dict) -> tuple:
+    """Same result as batch_errors(), one row at a time with the stdlib only."""
+    max_err = 0.0
+    max_err_frame = None
+    max_err_key = None
+    nan_frame = None
+
+    with csv_path.open("r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return max_err, max_err_frame, max_err_key, nan_frame
+
+        idx = {name: i for i, name in enumerate(header)}
+        s_i, pitch_i, tilt_i, lift_i = (idx[name] for name in POSE_COLUMNS)
+        corner_cols = [(key, idx[f"{key}_x"], idx[f"{key}_z"]) for key in CORNER_KEYS]
+
+        frame = -1
+        for row in reader:
+            # read_csv() skips blank lines, so they do not count as frames there either.
+            if not row:
+                continue
+            frame += 1
+
+            pred = predicted_corners_cpp(
+                cfg, float(row[s_i]), float(row[pitch_i]), float(row[tilt_i]), float(row[lift_i])
+            )
+
+            # Compare to logged corners (C++ coords)
+            for key, x_i, z_i in corner_cols:
+                px, pz = pred[key]
+                ex = abs(px - float(row[x_i]))
+                ez = abs(pz - float(row[z_i]))
+                if nan_frame is None and (math.isnan(ex) or math.isnan(ez)):
+                    nan_frame = frame
+                err = ez if math.isnan(ex) or ez > ex else ex
+                if err > max_err:
+                    max_err = err
+                    max_err_frame = frame
+                    max_err_key = key
+
+    return max_err, max_err_frame, max_err_key, nan_frame
+
+
 def main() -> int:
     repo_root = Path(__file__).resolve().parents[2]
     default_csv = repo_root / "tlf_log.csv"
@@ -96,33 +375,19 @@ def main() -> int:
 
     tol = float(cfg.get("viewer", {}).get("validation_tol", 1e-5))
 
-    max_err = 0.0
-    max_err_frame = None
-    max_err_key = None
-
-    with csv_path.open("r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for idx, row in enumerate(reader):
-            pred = predicted_corners_cpp(cfg, row)
-
-            # Compare to logged corners (C++ coords)
-            for key in ["rb", "rt", "fb", "ft"]:
-                px = pred[key].x
-                pz = pred[key].z
-                lx = float(row[f"{key}_x"])
-                lz = float(row[f"{key}_z"])
-
-                err = max(abs(px - lx), abs(pz - lz))
-                if err > max_err:
-                    max_err = err
-                    max_err_frame = idx
-                    max_err_key = key
+    if pd is not None:
+        max_err, max_err_frame, max_err_key, nan_frame = batch_errors(csv_path, cfg)
+    else:
+        max_err, max_err_frame, max_err_key, nan_frame = stream_errors(csv_path, cfg)
 
-    ok = max_err <= tol
+    # A NaN deviation is a broken log, never a pass.
+    ok = max_err <= tol and nan_frame is None
     status = "OK" if ok else "FAIL"
     print(f"{status}: max corner error = {max_err:.6g} (tol={tol})")
     if max_err_frame is not None:
         print(f"worst frame index: {max_err_frame}, corner: {max_err_key}")
+    if nan_frame is not None:
+        print(f"first NaN corner error at frame index: {nan_frame}")
 
     return 0 if ok else 2
 